@@ -5,14 +5,72 @@ This plugin wraps pytest-xdist and provides a simple --concurrency parameter
 that automatically selects the optimal strategy based on system capabilities.
 """
 
-import multiprocessing
-from collections import defaultdict
-from typing import List
+import functools
+import itertools
+import os
+import sys
+from typing import List, NamedTuple, Optional
 
 import pytest
 from _pytest.nodes import Item
 
 
+# Flags consumed by pytest_cmdline_parse, mapped to
+# (option name, consumes a value, value used when given bare).
+_HANDLERS = {
+    '--concurrency': ('concurrency', True, None),
+    '--task-grouping': ('task_grouping', True, 'file'),
+    '--multithreading': ('force_multithreading', False, None),
+    '--multiprocessing': ('force_multiprocessing', False, None),
+    '--io-bound': ('io_bound', False, None),
+}
+
+
+# Thread multiplier applied to the ``auto`` worker count for --io-bound runs.
+# Threads blocked on I/O release the GIL, so more threads than cores pays off.
+_IO_BOUND_WORKER_FACTOR = 4
+
+
+@functools.lru_cache(maxsize=1)
+def _auto_workers() -> int:
+    """
+    Return the number of CPUs usable by this process (cached).
+    
+    Prefers the affinity mask over the host CPU count, as pytest-xdist does,
+    so containers and HPC allocations are not oversubscribed.
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    
+    try:
+        import psutil
+    except ImportError:
+        pass
+    else:
+        try:
+            affinity = psutil.Process().cpu_affinity()
+        except (AttributeError, NotImplementedError, psutil.Error):
+            affinity = None  # cpu_affinity() isn't available on macOS
+        if affinity:
+            return len(affinity)
+    
+    # Platform can't report a count: run with one worker, as xdist does
+    return os.cpu_count() or 1
+
+
+class _Settings(NamedTuple):
+    """Resolved settings handed from pytest_cmdline_parse to pytest_configure."""
+    
+    workers: int
+    strategy: str
+    task_grouping: Optional[str]
+
+
+def _report(*lines: str) -> None:
+    """Write prefixed status lines to stdout with a single write call."""
+    sys.stdout.write(''.join(f"[AUTO-CONCURRENCY] {line}\n" for line in lines))
+
+
 def pytest_addoption(parser):
     """Add command line options."""
     group = parser.getgroup('auto-concurrency', 'Auto-concurrency options')
@@ -43,6 +101,12 @@ def pytest_addoption(parser):
         action='store_true',
         help='Force multiprocessing strategy (uses pytest-xdist)'
     )
+    
+    group.addoption(
+        '--io-bound',
+        action='store_true',
+        help='Hint that tests are I/O-bound: "auto" starts more threads than CPUs with the threading strategy'
+    )
 
 
 @pytest.hookimpl(wrapper=True)
@@ -53,80 +117,101 @@ def pytest_cmdline_parse(pluginmanager, args: List[str]):
     This wrapper ensures we execute before pytest-xdist processes arguments.
     """
     
-    # Extract our parameters
-    concurrency = None
-    task_grouping = None
-    force_multiprocessing = '--multiprocessing' in args
-    force_multithreading = '--multithreading' in args
-    
-    # Find --concurrency and --task-grouping values
-    for i, arg in enumerate(args):
-        if arg == '--concurrency' and i + 1 < len(args):
-            concurrency = args[i + 1]
-        elif arg.startswith('--concurrency='):
-            concurrency = arg.split('=', 1)[1]
-        elif arg == '--task-grouping' and i + 1 < len(args):
-            task_grouping = args[i + 1]
-        elif arg.startswith('--task-grouping='):
-            task_grouping = arg.split('=', 1)[1]
-        elif arg == '--task-grouping':
-            task_grouping = 'file'  # Default value when no parameter given
-    
-    # Remove our flags from args
-    cleaned_args = []
-    i = 0
-    while i < len(args):
+    # Fast path: ordinary runs without any of our flags pay a single scan
+    if not any(arg.startswith('--') and arg.partition('=')[0] in _HANDLERS for arg in args):
+        outcome = yield
+        return outcome
+    
+    # Extract our parameters and strip them from args in a single pass
+    options = {
+        'concurrency': None,
+        'task_grouping': None,
+        'force_multithreading': False,
+        'force_multiprocessing': False,
+        'io_bound': False,
+    }
+    
+    # Kept arguments are compacted to the front of args in place: i reads,
+    # w writes, and w never overtakes i
+    i = w = 0
+    n = len(args)
+    while i < n:
         arg = args[i]
         
-        # Skip our flags
-        if arg == '--concurrency':
-            i += 2  # Skip flag and value
+        # Fast reject: none of our flags can match without a '--' prefix
+        if not arg.startswith('--'):
+            args[w] = arg
+            w += 1
+            i += 1
             continue
-        elif arg.startswith('--concurrency='):
-            i += 1  # Skip combined flag
+        
+        # One partition per token: key is the flag, sep marks --flag=value
+        key, sep, value = arg.partition('=')
+        handler = _HANDLERS.get(key)
+        if handler is None:
+            args[w] = arg
+            w += 1
+            i += 1
             continue
-        elif arg == '--task-grouping':
-            # Check if next arg is a value or another flag
-            if i + 1 < len(args) and not args[i + 1].startswith('-'):
-                i += 2  # Skip flag and value
+        
+        if sep:
+            if handler[1]:
+                options[handler[0]] = value
             else:
-                i += 1  # Skip just the flag (bare --task-grouping)
-            continue
-        elif arg.startswith('--task-grouping='):
-            i += 1  # Skip combined flag
-            continue
-        elif arg in ['--multithreading', '--multiprocessing']:
-            i += 1  # Skip our flags
+                args[w] = arg  # Switches don't take a value
+                w += 1
+            i += 1
             continue
         
-        cleaned_args.append(arg)
-        i += 1
+        name, consumes_value, bare_value = handler
+        if not consumes_value:
+            options[name] = True
+            i += 1
+        elif bare_value is not None and (i + 1 >= n or args[i + 1].startswith('-')):
+            options[name] = bare_value
+            i += 1
+        else:
+            if i + 1 < n:
+                options[name] = args[i + 1]
+            i += 2  # Skip flag and value
+    
+    del args[w:]
+    
+    concurrency = options['concurrency']
+    task_grouping = options['task_grouping']
+    force_multithreading = options['force_multithreading']
+    force_multiprocessing = options['force_multiprocessing']
+    io_bound = options['io_bound']
     
     # Process concurrency if specified
     if concurrency:
+        # Determine strategy
+        cpu_count = _auto_workers()
+        use_threading = force_multithreading or (not force_multiprocessing and cpu_count <= 2)
+        status = []
+        
         # Convert 'auto' to CPU count
         if concurrency == 'auto':
-            worker_count = multiprocessing.cpu_count()
+            worker_count = cpu_count
+            if io_bound and use_threading:
+                worker_count *= _IO_BOUND_WORKER_FACTOR
         else:
             try:
                 worker_count = int(concurrency)
             except ValueError:
                 raise ValueError(f"Invalid --concurrency value: {concurrency}")
         
-        # Determine strategy
-        cpu_count = multiprocessing.cpu_count()
-        
-        if force_multithreading or (not force_multiprocessing and cpu_count <= 2):
+        if use_threading:
             # Use threading strategy (pytest-parallel) 
-            cleaned_args.extend(['--workers', str(worker_count)])
+            args.extend(['--workers', str(worker_count)])
             strategy = "threading"
             
             # Task grouping for threading will be handled by our plugin class
             if task_grouping:
-                print(f"[AUTO-CONCURRENCY] Task grouping ({task_grouping}) enabled for threading strategy")
+                status.append(f"Task grouping ({task_grouping}) enabled for threading strategy")
         else:
             # Use multiprocessing strategy (pytest-xdist)
-            cleaned_args.extend(['-n', str(worker_count)])
+            args.extend(['-n', str(worker_count)])
             strategy = "multiprocessing"
             
             if task_grouping:
@@ -137,22 +222,17 @@ def pytest_cmdline_parse(pluginmanager, args: List[str]):
                     dist_value = 'loadgroup'
                 else:
                     dist_value = 'loadfile'  # Default fallback
-                cleaned_args.extend(['--dist', dist_value])
+                args.extend(['--dist', dist_value])
         
-        print(f"[AUTO-CONCURRENCY] Using {worker_count} workers with {strategy} strategy")
+        status.append(f"Using {worker_count} workers with {strategy} strategy")
         if task_grouping and strategy == "multiprocessing":
-            dist_name = 'loadfile' if task_grouping == 'file' else 'loadgroup'
-            print(f"[AUTO-CONCURRENCY] Task grouping enabled (--dist={dist_name})")
-    
-    # Update args in place
-    args[:] = cleaned_args
+            status.append(f"Task grouping enabled (--dist={dist_value})")
+        _report(*status)
     
     # Store configuration for the plugin instance
     if concurrency:
         # Store settings on the pluginmanager for pytest_configure to pick up
-        setattr(pluginmanager, '_auto_concurrency_workers', worker_count)
-        setattr(pluginmanager, '_auto_concurrency_strategy', strategy)
-        setattr(pluginmanager, '_auto_concurrency_task_grouping', task_grouping)
+        pluginmanager._auto_concurrency = _Settings(worker_count, strategy, task_grouping)
     
     # Let other plugins run
     outcome = yield
@@ -162,86 +242,79 @@ def pytest_cmdline_parse(pluginmanager, args: List[str]):
 class AutoConcurrencyPlugin:
     """Plugin class that handles threading-based file grouping scheduling."""
     
+    __slots__ = ('config', 'workers', 'strategy', 'task_grouping')
+    
     def __init__(self, config):
         self.config = config
-        self.workers = getattr(config.pluginmanager, '_auto_concurrency_workers', None)
-        self.strategy = getattr(config.pluginmanager, '_auto_concurrency_strategy', None)
-        self.task_grouping = getattr(config.pluginmanager, '_auto_concurrency_task_grouping', None)
+        settings = getattr(config.pluginmanager, '_auto_concurrency', None)
+        if settings is None:
+            self.workers = self.strategy = self.task_grouping = None
+        else:
+            self.workers, self.strategy, self.task_grouping = settings
     
-    def _group_tests_by_file(self, items: List[Item]) -> List[Item]:
-        """Group test items by their file path and return reordered list."""
-        groups = defaultdict(list)
-        
-        for item in items:
-            # Extract file path (everything before first '::')
-            file_path = item.nodeid.split('::', 1)[0]
-            groups[file_path].append(item)
-        
-        # Flatten groups back to list, keeping tests from same file together
-        reordered_items = []
-        for file_path, file_tests in groups.items():
-            reordered_items.extend(file_tests)
-        
-        return reordered_items
+    def _group_keys(self, items: List[Item]) -> List[str]:
+        """Return each item's file or package path, parsing every nodeid once."""
+        file_paths = [item.nodeid.partition('::')[0] for item in items]
+        if self.task_grouping == 'file':
+            return file_paths
+        # nodeids always use '/' regardless of platform, so no os.path here
+        return [file_path.rpartition('/')[0] or '.' for file_path in file_paths]
     
-    def _group_tests_by_package(self, items: List[Item]) -> List[Item]:
-        """Group test items by their package/directory and return reordered list."""
-        groups = defaultdict(list)
+    def _group_items(self, items: List[Item], keys: List[str]) -> int:
+        """Group items in place by their parallel keys and return the group count."""
+        groups = {}
         
-        for item in items:
-            # Extract directory from file path
-            file_path = item.nodeid.split('::', 1)[0]
-            package_path = '/'.join(file_path.split('/')[:-1]) or '.'
-            groups[package_path].append(item)
+        for item, key in zip(items, keys):
+            groups.setdefault(key, []).append(item)
         
-        # Flatten groups back to list, keeping tests from same package together
-        reordered_items = []
-        for package_path, package_tests in groups.items():
-            reordered_items.extend(package_tests)
-        
-        return reordered_items
+        # Flatten groups back to list, keeping tests from same group together
+        items[:] = itertools.chain.from_iterable(groups.values())
+        return len(groups)
     
     def pytest_collection_modifyitems(self, config, items):
         """Modify test collection order to group tests before pytest-parallel sees them."""
         
         # Only handle threading strategy with task grouping
-        if (self.strategy != "threading" or not self.task_grouping or not self.workers):
+        if (self.strategy != "threading" or not self.task_grouping):
             return  # Don't modify items
         
         if len(items) <= 1:
             return  # No point in grouping single test
         
-        # Count groups before reordering
-        original_files = set()
-        original_packages = set()
-        for item in items:
-            file_path = item.nodeid.split('::', 1)[0]
-            original_files.add(file_path)
-            package_path = '/'.join(file_path.split('/')[:-1]) or '.'
-            original_packages.add(package_path)
+        if self.workers is None or self.workers <= 1:
+            return  # A single worker runs tests in order, grouping changes nothing
         
-        # Reorder tests based on task_grouping setting
-        if self.task_grouping == 'file':
-            grouped_items = self._group_tests_by_file(items)
-            group_count = len(original_files)
-            group_type = "file"
-        else:  # package
-            grouped_items = self._group_tests_by_package(items)
-            group_count = len(original_packages)
-            group_type = "package"
+        keys = self._group_keys(items)
+        group_type = "file" if self.task_grouping == 'file' else "package"
         
-        # Replace the original items list with grouped version
-        items[:] = grouped_items
+        # Fast path: pytest collects file by file, so items are usually
+        # already contiguous per group and need no reordering
+        seen = set()
+        last_key = None
+        for key in keys:
+            if key != last_key:
+                if key in seen:
+                    break  # Interleaved, fall through to the reorder
+                seen.add(key)
+                last_key = key
+        else:
+            _report(
+                f"{len(items)} tests already grouped into {len(seen)} {group_type} groups for threading strategy",
+                f"pytest-parallel will now schedule grouped tests across {self.workers} threads",
+            )
+            return
         
-        print(f"[AUTO-CONCURRENCY] Reordered {len(items)} tests into {group_count} {group_type} groups for threading strategy")
-        print(f"[AUTO-CONCURRENCY] pytest-parallel will now schedule grouped tests across {self.workers} threads")
+        group_count = self._group_items(items, keys)
+        
+        _report(
+            f"Reordered {len(items)} tests into {group_count} {group_type} groups for threading strategy",
+            f"pytest-parallel will now schedule grouped tests across {self.workers} threads",
+        )
 
 
 def pytest_configure(config):
     """Register the plugin if threading strategy with task grouping is enabled."""
-    if (hasattr(config.pluginmanager, '_auto_concurrency_strategy') and
-        getattr(config.pluginmanager, '_auto_concurrency_strategy') == "threading" and
-        getattr(config.pluginmanager, '_auto_concurrency_task_grouping')):
-        
+    settings = getattr(config.pluginmanager, '_auto_concurrency', None)
+    if settings is not None and settings.strategy == "threading" and settings.task_grouping:
         plugin = AutoConcurrencyPlugin(config)
-        config.pluginmanager.register(plugin, 'auto_concurrency_threading')
\ No newline at end of file
+        config.pluginmanager.register(plugin, 'auto_concurrency_threading')
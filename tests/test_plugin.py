@@ -1,8 +1,17 @@
 """Unit tests for pytest-auto-concurrency plugin."""
 
+import sys
+
 import pytest
 from unittest.mock import patch, MagicMock
-from pytest_auto_concurrency.plugin import pytest_addoption, pytest_cmdline_parse
+from pytest_auto_concurrency.plugin import (
+    AutoConcurrencyPlugin,
+    _Settings,
+    _auto_workers,
+    pytest_addoption,
+    pytest_cmdline_parse,
+    pytest_configure,
+)
 
 
 class TestPytestAddOption:
@@ -24,22 +33,66 @@ class TestPytestAddOption:
             ('--concurrency',),
             ('--task-grouping',), 
             ('--multithreading',),
-            ('--multiprocessing',)
+            ('--multiprocessing',),
+            ('--io-bound',)
         ]
         
         actual_calls = [call[0][0] for call in group.addoption.call_args_list]
-        assert len(actual_calls) == 4
+        assert len(actual_calls) == 5
         for expected in [call[0] for call in expected_calls]:
             assert expected in actual_calls
 
 
+class TestAutoWorkers:
+    """Test _auto_workers helper."""
+    
+    def setup_method(self):
+        _auto_workers.cache_clear()
+    
+    def teardown_method(self):
+        _auto_workers.cache_clear()
+    
+    @patch('os.sched_getaffinity', create=True)
+    def test_prefers_affinity_mask(self, mock_affinity):
+        """Test that the affinity mask wins over the host CPU count."""
+        mock_affinity.return_value = {0, 1, 2}
+        
+        with patch('os.cpu_count', return_value=36):
+            assert _auto_workers() == 3
+    
+    @patch('os.sched_getaffinity', create=True)
+    def test_result_is_cached(self, mock_affinity):
+        """Test that the CPU count is only queried once."""
+        mock_affinity.return_value = {0, 1}
+        
+        assert _auto_workers() == 2
+        assert _auto_workers() == 2
+        mock_affinity.assert_called_once_with(0)
+    
+    def test_falls_back_to_os_cpu_count(self, monkeypatch):
+        """Test the fallback when neither affinity source is available."""
+        monkeypatch.delattr('os.sched_getaffinity', raising=False)
+        monkeypatch.setitem(sys.modules, 'psutil', None)
+        monkeypatch.setattr('os.cpu_count', lambda: 6)
+        
+        assert _auto_workers() == 6
+    
+    def test_falls_back_to_one_when_count_unknown(self, monkeypatch):
+        """Test that an undeterminable CPU count yields a single worker."""
+        monkeypatch.delattr('os.sched_getaffinity', raising=False)
+        monkeypatch.setitem(sys.modules, 'psutil', None)
+        monkeypatch.setattr('os.cpu_count', lambda: None)
+        
+        assert _auto_workers() == 1
+
+
 class TestPytestCmdlineParse:
     """Test pytest_cmdline_parse function."""
     
-    @patch('multiprocessing.cpu_count')
-    def test_concurrency_auto_with_multiprocessing(self, mock_cpu_count):
+    @patch('pytest_auto_concurrency.plugin._auto_workers')
+    def test_concurrency_auto_with_multiprocessing(self, mock_auto_workers):
         """Test concurrency=auto with >2 cores uses multiprocessing."""
-        mock_cpu_count.return_value = 4
+        mock_auto_workers.return_value = 4
         pluginmanager = MagicMock()
         args = ['--concurrency', 'auto', 'tests/']
         
@@ -60,10 +113,10 @@ class TestPytestCmdlineParse:
         assert '--concurrency' not in args
         assert 'auto' not in args
     
-    @patch('multiprocessing.cpu_count')  
-    def test_concurrency_with_task_grouping(self, mock_cpu_count):
+    @patch('pytest_auto_concurrency.plugin._auto_workers')  
+    def test_concurrency_with_task_grouping(self, mock_auto_workers):
         """Test concurrency with task-grouping adds dist parameter."""
-        mock_cpu_count.return_value = 4
+        mock_auto_workers.return_value = 4
         pluginmanager = MagicMock()
         args = ['--concurrency', '2', '--task-grouping=file', 'tests/']
         
@@ -84,10 +137,10 @@ class TestPytestCmdlineParse:
         assert '--concurrency' not in args
         assert '--task-grouping=file' not in args
     
-    @patch('multiprocessing.cpu_count')
-    def test_concurrency_with_multithreading_flag(self, mock_cpu_count):
+    @patch('pytest_auto_concurrency.plugin._auto_workers')
+    def test_concurrency_with_multithreading_flag(self, mock_auto_workers):
         """Test that --multithreading flag forces threading strategy."""
-        mock_cpu_count.return_value = 8  # High CPU count
+        mock_auto_workers.return_value = 8  # High CPU count
         pluginmanager = MagicMock()
         args = ['--concurrency', '4', '--multithreading', 'tests/']
         
@@ -107,6 +160,32 @@ class TestPytestCmdlineParse:
         assert '--concurrency' not in args
         assert '--multithreading' not in args
     
+    @patch('pytest_auto_concurrency.plugin._auto_workers')
+    def test_io_bound_scales_auto_threads(self, mock_auto_workers):
+        """Test that --io-bound multiplies the auto worker count for threading."""
+        mock_auto_workers.return_value = 2
+        pluginmanager = MagicMock()
+        args = ['--concurrency', 'auto', '--io-bound', 'tests/']
+        
+        wrapper_gen = pytest_cmdline_parse(pluginmanager, args)
+        result = next(wrapper_gen)
+        
+        assert args[args.index('--workers') + 1] == '8'
+        assert '--io-bound' not in args
+        assert pluginmanager._auto_concurrency == _Settings(8, 'threading', None)
+    
+    @patch('pytest_auto_concurrency.plugin._auto_workers')
+    def test_combined_flag_values(self, mock_auto_workers):
+        """Test --flag=value forms and that unrelated long options survive."""
+        mock_auto_workers.return_value = 4
+        pluginmanager = MagicMock()
+        args = ['--concurrency=3', '--tb=short', '--task-grouping=package', 'tests/']
+        
+        wrapper_gen = pytest_cmdline_parse(pluginmanager, args)
+        result = next(wrapper_gen)
+        
+        assert args == ['--tb=short', 'tests/', '-n', '3', '--dist', 'loadgroup']
+    
     def test_no_concurrency_no_changes(self):
         """Test that args are unchanged when no --concurrency flag."""
         pluginmanager = MagicMock()
@@ -125,10 +204,10 @@ class TestPytestCmdlineParse:
         # Args should be unchanged
         assert args == original_args
     
-    @patch('multiprocessing.cpu_count')
-    def test_task_grouping_package_maps_to_loadgroup(self, mock_cpu_count):
+    @patch('pytest_auto_concurrency.plugin._auto_workers')
+    def test_task_grouping_package_maps_to_loadgroup(self, mock_auto_workers):
         """Test that --task-grouping=package maps to --dist=loadgroup."""
-        mock_cpu_count.return_value = 4
+        mock_auto_workers.return_value = 4
         pluginmanager = MagicMock()
         args = ['--concurrency', '2', '--task-grouping=package', 'tests/']
         
@@ -144,4 +223,145 @@ class TestPytestCmdlineParse:
         # Check that loadgroup is used
         assert '--dist' in args
         assert 'loadgroup' in args
-        assert 'loadfile' not in args
\ No newline at end of file
+        assert 'loadfile' not in args
+    
+    @patch('pytest_auto_concurrency.plugin._auto_workers')
+    def test_bare_task_grouping_followed_by_flag(self, mock_auto_workers):
+        """Test that bare --task-grouping defaults to file and keeps the next flag."""
+        mock_auto_workers.return_value = 4
+        pluginmanager = MagicMock()
+        args = ['--concurrency', '2', '--task-grouping', '-v', 'tests/']
+        
+        wrapper_gen = pytest_cmdline_parse(pluginmanager, args)
+        result = next(wrapper_gen)
+        
+        # -v must survive and grouping must fall back to file
+        assert '-v' in args
+        assert '--dist' in args
+        assert 'loadfile' in args
+        assert '--task-grouping' not in args
+
+
+class TestPytestConfigure:
+    """Test pytest_configure function."""
+    
+    def test_registers_plugin_for_grouped_threading(self):
+        """Test that the grouping plugin is registered for threading with task grouping."""
+        config = MagicMock()
+        config.pluginmanager._auto_concurrency = _Settings(2, 'threading', 'file')
+        
+        pytest_configure(config)
+        
+        plugin, name = config.pluginmanager.register.call_args[0]
+        assert name == 'auto_concurrency_threading'
+        assert (plugin.workers, plugin.strategy, plugin.task_grouping) == (2, 'threading', 'file')
+    
+    def test_skips_registration_for_multiprocessing(self):
+        """Test that nothing is registered for the multiprocessing strategy."""
+        config = MagicMock()
+        config.pluginmanager._auto_concurrency = _Settings(4, 'multiprocessing', 'file')
+        
+        pytest_configure(config)
+        
+        config.pluginmanager.register.assert_not_called()
+
+
+def _make_plugin(task_grouping='file', workers=4, strategy='threading'):
+    """Build an AutoConcurrencyPlugin from a mocked config."""
+    config = MagicMock()
+    config.pluginmanager._auto_concurrency = _Settings(workers, strategy, task_grouping)
+    return AutoConcurrencyPlugin(config)
+
+
+def _make_items(*nodeids):
+    """Build mock test items with the given node ids."""
+    return [MagicMock(nodeid=nodeid) for nodeid in nodeids]
+
+
+class TestCollectionModifyItems:
+    """Test AutoConcurrencyPlugin.pytest_collection_modifyitems."""
+    
+    def test_groups_interleaved_items_by_file(self, capsys):
+        """Test that tests from the same file end up adjacent."""
+        plugin = _make_plugin('file')
+        items = _make_items(
+            'tests/a.py::test_1',
+            'tests/b.py::test_1',
+            'tests/a.py::test_2',
+            'tests/b.py::test_2',
+        )
+        
+        plugin.pytest_collection_modifyitems(plugin.config, items)
+        
+        assert [item.nodeid for item in items] == [
+            'tests/a.py::test_1',
+            'tests/a.py::test_2',
+            'tests/b.py::test_1',
+            'tests/b.py::test_2',
+        ]
+        assert 'into 2 file groups' in capsys.readouterr().out
+    
+    def test_groups_interleaved_items_by_package(self, capsys):
+        """Test that tests from the same directory end up adjacent."""
+        plugin = _make_plugin('package')
+        items = _make_items(
+            'tests/unit/test_a.py::test_1',
+            'tests/integration/test_b.py::test_1',
+            'tests/unit/test_c.py::test_1',
+            'test_root.py::test_1',
+        )
+        
+        plugin.pytest_collection_modifyitems(plugin.config, items)
+        
+        assert [item.nodeid for item in items] == [
+            'tests/unit/test_a.py::test_1',
+            'tests/unit/test_c.py::test_1',
+            'tests/integration/test_b.py::test_1',
+            'test_root.py::test_1',
+        ]
+        assert 'into 3 package groups' in capsys.readouterr().out
+    
+    def test_contiguous_items_skip_reordering(self, capsys):
+        """Test that already grouped items are left as-is."""
+        plugin = _make_plugin('file')
+        items = _make_items('tests/a.py::test_1', 'tests/a.py::test_2', 'tests/b.py::test_1')
+        original = list(items)
+        
+        with patch.object(AutoConcurrencyPlugin, '_group_items') as mock_group:
+            plugin.pytest_collection_modifyitems(plugin.config, items)
+        
+        mock_group.assert_not_called()
+        assert items == original
+        assert 'already grouped into 2 file groups' in capsys.readouterr().out
+    
+    def test_group_items_follows_parallel_keys(self):
+        """Test that groups keep first-seen order and tests keep their order within a group."""
+        plugin = _make_plugin('file')
+        items = _make_items('t::1', 't::2', 't::3', 't::4', 't::5')
+        keys = ['b', 'a', 'b', 'c', 'a']
+        
+        group_count = plugin._group_items(items, keys)
+        
+        assert [item.nodeid for item in items] == ['t::1', 't::3', 't::2', 't::5', 't::4']
+        assert group_count == 3
+    
+    @pytest.mark.parametrize('workers', [None, 0, 1])
+    def test_single_worker_leaves_items_alone(self, workers):
+        """Test that items are untouched when there is at most one worker."""
+        plugin = _make_plugin('file', workers=workers)
+        items = _make_items('tests/a.py::test_1', 'tests/b.py::test_1', 'tests/a.py::test_2')
+        original = list(items)
+        
+        plugin.pytest_collection_modifyitems(plugin.config, items)
+        
+        assert items == original
+    
+    def test_multiprocessing_strategy_leaves_items_alone(self):
+        """Test that items are untouched outside the threading strategy."""
+        plugin = _make_plugin('file', strategy='multiprocessing')
+        items = _make_items('tests/a.py::test_1', 'tests/b.py::test_1', 'tests/a.py::test_2')
+        original = list(items)
+        
+        plugin.pytest_collection_modifyitems(plugin.config, items)
+        
+        assert items == original